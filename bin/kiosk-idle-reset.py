@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-import os, time, glob, subprocess, select, json
+import os, time, glob, subprocess, select, json, ctypes, struct
 from evdev import InputDevice, ecodes
 
 
@@ -9,12 +9,21 @@ USER_HOME = os.path.expanduser(f"~{USER}")
 
 CONFIG_FILE = os.path.join(USER_HOME, "kiosk_config.json")
 STATE_FILE = "/tmp/kiosk_state.json"
+CHROMIUM_PID_FILE = "/tmp/kiosk_chromium.pid"  # written by kiosk-session.sh
 RESET_SCRIPT = "/usr/local/bin/kiosk-reset-url.sh"
 DEFAULT_IDLE = 600  # fallback idle time (10 minutes)
 
-ALT_KEYCODES = {ecodes.KEY_LEFTALT, ecodes.KEY_RIGHTALT}
+INPUT_TYPES = frozenset((ecodes.EV_KEY, ecodes.EV_REL, ecodes.EV_ABS))
+LEFT_ALT, RIGHT_ALT = ecodes.KEY_LEFTALT, ecodes.KEY_RIGHTALT
 F4_KEYCODE = ecodes.KEY_F4
 
+# inotify(7) constants, see <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+INOTIFY_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+_libc = ctypes.CDLL(None, use_errno=True)
+
 
 def load_idle_timeout():
     """Read idle_timeout from the kiosk config or use fallback."""
@@ -28,40 +37,88 @@ def load_idle_timeout():
     return DEFAULT_IDLE
 
 
+def watch_file(path):
+    """Return a non-blocking inotify fd that fires when `path` is rewritten."""
+    fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if fd < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    # Watch the directory so editors that save via rename are seen too
+    directory = os.fsencode(os.path.dirname(path))
+    if _libc.inotify_add_watch(fd, directory, IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+        err = ctypes.get_errno()
+        os.close(fd)
+        raise OSError(err, os.strerror(err))
+    return fd
+
+
+def file_changed(fd, path):
+    """Drain pending inotify events and report whether any concern `path`."""
+    name = os.fsencode(os.path.basename(path))
+    changed = False
+    while True:
+        try:
+            buf = os.read(fd, 4096)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(buf):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(buf, offset)
+            offset += INOTIFY_EVENT.size
+            if buf[offset:offset + length].rstrip(b"\0") == name:
+                changed = True
+            offset += length
+
+
 def write_state(active):
     """Write the current active/idle state to /tmp."""
     data = {"active": active, "timestamp": time.time()}
+    tmp = f"{STATE_FILE}.tmp"
     try:
-        with open(STATE_FILE, "w") as f:
+        # Write then rename so readers never see a half-written file
+        with open(tmp, "w") as f:
             json.dump(data, f)
+        os.replace(tmp, STATE_FILE)
     except Exception as e:
         print(f"Error writing state: {e}")
 
 
 def chromium_running():
     """Check if Chromium is currently running."""
-    try:
-        subprocess.run(
-            ["pgrep", "chromium"],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
-        return True
-    except subprocess.CalledProcessError:
-        return False
+    # Same match as `pgrep chromium`, without forking a process
+    with os.scandir("/proc") as it:
+        for entry in it:
+            if not entry.name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry.name}/comm") as f:
+                    if "chromium" in f.read():
+                        return True
+            except OSError:
+                continue
+    return False
 
 
-def wait_for_chromium(timeout=30):
-    """Wait for Chromium to start after reset."""
-    start = time.time()
-    while time.time() - start < timeout:
-        if chromium_running():
-            print("Chromium restarted successfully.")
-            return True
-        time.sleep(1)
-    print("Chromium did not restart within timeout.")
-    return False
+def chromium_started(pid_published=None):
+    """Check, without blocking, whether Chromium has come back after a reset.
+
+    `pid_published` says whether kiosk-session.sh has rewritten
+    CHROMIUM_PID_FILE since the reset began, or is None when that file
+    could not be watched, in which case /proc is scanned instead. The PID
+    is probed with signal 0, which only confirms it is alive right now.
+    """
+    if pid_published is None:
+        return chromium_running()
+    if not pid_published:
+        return False
+    try:
+        with open(CHROMIUM_PID_FILE) as f:
+            os.kill(int(f.read()), 0)
+    except PermissionError:
+        return True  # exists, just not ours to signal
+    except (OSError, ValueError):
+        return False
+    return True
 
 
 def get_input_devices():
@@ -76,7 +133,7 @@ def get_input_devices():
             types = caps.keys()
 
             # Only include devices that support real user input
-            if any(t in (ecodes.EV_KEY, ecodes.EV_REL, ecodes.EV_ABS) for t in types):
+            if not INPUT_TYPES.isdisjoint(types):
                 devices.append(dev)
                 print(f"Tracking input device: {dev.name}")
             else:
@@ -106,40 +163,67 @@ def main():
     last_activity = time.time()
     devices = get_input_devices()
     idle_seconds = load_idle_timeout()
+
+    # Edge-triggered epoll: one wakeup per burst, each device is drained below
+    ep = select.epoll()
+    devices_by_fd = {}
+    for d in devices:
+        ep.register(d.fd, select.EPOLLIN | select.EPOLLET)
+        devices_by_fd[d.fd] = d
+
+    # Reload the config only when it is actually rewritten
+    config_fd = None
+    try:
+        config_fd = watch_file(CONFIG_FILE)
+        ep.register(config_fd, select.EPOLLIN)
+    except Exception as e:
+        print(f"Config watch failed: {e}")
+
     print(f"Monitoring {len(devices)} input devices — idle timeout = {idle_seconds}s")
 
     write_state(True)
+    current_state = True
 
     pressed_keys = set()
 
-    # Track modification time for on-the-fly config reloads
-    last_config_mtime = os.path.getmtime(CONFIG_FILE) if os.path.exists(CONFIG_FILE) else 0
-    idle_seconds = load_idle_timeout()
+    # Pending reset: the script runs in the background while input keeps draining
+    reset_proc = None
+    pid_watch = None
+    pid_published = None
+    reset_deadline = None
 
     while True:
-        # Check if config file changed
-        try:
-            if os.path.exists(CONFIG_FILE):
-                mtime = os.path.getmtime(CONFIG_FILE)
-                if mtime != last_config_mtime:
-                    idle_seconds = load_idle_timeout()
-                    last_config_mtime = mtime
-                    print(f"Config reloaded — new idle timeout = {idle_seconds}s")
-        except Exception as e:
-            print(f"Config check failed: {e}")
-
-        r, _, _ = select.select([d.fd for d in devices], [], [], 1)
+        events = ep.poll(1)
         now = time.time()
+        # Config and PID file watches also wake the poll; only input counts
+        device_activity = False
 
-        if r:
-            for d in devices:
-                if d.fd in r:
-                    for ev in d.read():
+        if events:
+            for fd, _ in events:
+                if fd == config_fd:
+                    if file_changed(config_fd, CONFIG_FILE):
+                        idle_seconds = load_idle_timeout()
+                        print(f"Config reloaded — new idle timeout = {idle_seconds}s")
+                    continue
+                if fd == pid_watch:
+                    continue  # handled with the pending reset below
+
+                device = devices_by_fd[fd]
+                device_activity = True
+                while True:
+                    try:
+                        batch = list(device.read())
+                    except BlockingIOError:
+                        break  # queue drained, wait for the next edge
+
+                    for ev in batch:
                         if ev.type == ecodes.EV_KEY:
                             if ev.value == 1:  # key down
                                 pressed_keys.add(ev.code)
                                 # Detect ALT+F4 combination
-                                if F4_KEYCODE in pressed_keys and pressed_keys & ALT_KEYCODES:
+                                if F4_KEYCODE in pressed_keys and (
+                                    LEFT_ALT in pressed_keys or RIGHT_ALT in pressed_keys
+                                ):
                                     stop_all_services()
                                     return
                             elif ev.value == 0:  # key up
@@ -147,15 +231,53 @@ def main():
 
                         elif ev.type in (ecodes.EV_ABS, ecodes.EV_REL):
                             last_activity = now
-                            write_state(True)
+                            # Only rewrite on idle -> active transitions
+                            if not current_state:
+                                write_state(True)
+                                current_state = True
 
-        elif now - last_activity >= idle_seconds:
+        if not device_activity and reset_proc is None and now - last_activity >= idle_seconds:
             print(f"Idle for {idle_seconds}s — restarting kiosk session...")
-            subprocess.run([RESET_SCRIPT], check=False)
-            wait_for_chromium(timeout=5)
-            write_state(False)
+            # Watch for the new PID before the reset so it cannot be missed
+            try:
+                pid_watch = watch_file(CHROMIUM_PID_FILE)
+                ep.register(pid_watch, select.EPOLLIN | select.EPOLLET)
+                pid_published = False
+            except Exception as e:
+                print(f"PID file watch failed: {e}")
+                if pid_watch is not None:
+                    os.close(pid_watch)
+                pid_watch = None
+            reset_proc = subprocess.Popen(
+                [RESET_SCRIPT],
+                start_new_session=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
             last_activity = now
 
+        # Once the reset script is done, give Chromium a few seconds to come back.
+        # Idle is only published afterwards so the cycler can't send keys mid-restart.
+        if reset_proc is not None and reset_proc.poll() is not None:
+            if reset_deadline is None:
+                reset_deadline = now + 5
+            # Remember the PID file was rewritten; the watch is drained after this
+            if pid_watch is not None and file_changed(pid_watch, CHROMIUM_PID_FILE):
+                pid_published = True
+            started = chromium_started(pid_published)
+            if started or now >= reset_deadline:
+                if started:
+                    print("Chromium restarted successfully.")
+                else:
+                    print("Chromium did not restart within timeout.")
+                if current_state:
+                    write_state(False)
+                    current_state = False
+                if pid_watch is not None:
+                    ep.unregister(pid_watch)
+                    os.close(pid_watch)
+                reset_proc = pid_watch = pid_published = reset_deadline = None
+
 
 if __name__ == "__main__":
     main()
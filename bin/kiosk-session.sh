@@ -15,6 +15,7 @@ CONFIG="$USER_HOME/kiosk_config.json"
 FALLBACK_URL="http://0.0.0.0:8080"
 MANAGER_APP="/usr/local/bin/kiosk-manager.py"
 LOGFILE="/tmp/kiosk-session.log"
+PIDFILE="/tmp/kiosk_chromium.pid"
 URL=""
 
 echo "[$(date '+%Y-%m-%d %H:%M:%S')] Starting kiosk session for user: $USER_NAME" >> "$LOGFILE"
@@ -70,6 +71,9 @@ chromium \
 
 CHROME_PID=$!
 
+# Publish the PID so kiosk-idle-reset can wait on it without polling
+echo "$CHROME_PID" > "$PIDFILE"
+
 # Give Chromium time to open tabs
 sleep 2
 
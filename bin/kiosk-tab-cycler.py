@@ -2,30 +2,74 @@
 import os
 import time
 import json
+import ctypes
+import struct
+import selectors
 import subprocess
 
 # --- Configuration ---
+USER = os.environ.get("SUDO_USER") or os.environ.get("USER") or "pi"
+USER_HOME = os.path.expanduser(f"~{USER}")
+
+CONFIG_FILE = os.path.join(USER_HOME, "kiosk_config.json")
 STATE_FILE = "/tmp/kiosk_state.json"
 DEFAULT_INTERVAL = 31  # seconds
 LOGFILE = "/tmp/kiosk-tab-cycler.log"
 
+# inotify(7) constants, see <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+INOTIFY_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
 
-def read_cycle_interval():
-    """Read the cycle interval from the kiosk config (if available)."""
-    user = os.environ.get("SUDO_USER") or os.environ.get("USER") or "pi"
-    config_file = os.path.expanduser(f"~{user}/kiosk_config.json")
+_libc = ctypes.CDLL(None, use_errno=True)
 
-    if os.path.exists(config_file):
+
+def read_cycle_interval(log):
+    """Read the cycle interval from the kiosk config (if available)."""
+    if os.path.exists(CONFIG_FILE):
         try:
-            with open(config_file) as f:
+            with open(CONFIG_FILE) as f:
                 cfg = json.load(f)
             interval = int(cfg.get("cycle_interval", DEFAULT_INTERVAL))
             return interval
         except Exception as e:
-            print(f"Error reading config: {e}", file=open(LOGFILE, "a"))
+            log.write(f"Error reading config: {e}\n")
     return DEFAULT_INTERVAL
 
 
+def watch_file(path):
+    """Return a non-blocking inotify fd that fires when `path` is rewritten."""
+    fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if fd < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    # Watch the directory so files replaced via rename are seen too
+    directory = os.fsencode(os.path.dirname(path))
+    if _libc.inotify_add_watch(fd, directory, IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+        err = ctypes.get_errno()
+        os.close(fd)
+        raise OSError(err, os.strerror(err))
+    return fd
+
+
+def file_changed(fd, path):
+    """Drain pending inotify events and report whether any concern `path`."""
+    name = os.fsencode(os.path.basename(path))
+    changed = False
+    while True:
+        try:
+            buf = os.read(fd, 4096)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(buf):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(buf, offset)
+            offset += INOTIFY_EVENT.size
+            if buf[offset:offset + length].rstrip(b"\0") == name:
+                changed = True
+            offset += length
+
+
 def is_idle():
     """Check if the system is idle according to /tmp/kiosk_state.json."""
     try:
@@ -38,27 +82,47 @@ def is_idle():
     return True
 
 
-def switch_tab():
+def switch_tab(log):
     """Send ctrl+Tab to Chromium."""
     try:
-        subprocess.run(["xdotool", "key", "ctrl+Tab"], check=False)
-        time.sleep(0.2)
-        subprocess.run(["xdotool", "key", "0xffc2"], check=False)
+        # One xdotool process reading a script from stdin instead of one per key
+        script = "key ctrl+Tab\nsleep 0.2\nkey 0xffc2\n"
+        subprocess.run(["xdotool", "-"], input=script, text=True, check=False)
     except Exception as e:
-        with open(LOGFILE, "a") as log:
-            log.write(f"Error switching tab: {e}\n")
+        log.write(f"Error switching tab: {e}\n")
 
 
 def main():
-    interval = read_cycle_interval()
+    # Keep one line-buffered log handle open for the life of the service
+    log = open(LOGFILE, "a", buffering=1)
+    interval = read_cycle_interval(log)
     print(f"Tab cycler running (interval: {interval}s, idle-only mode).")
 
+    # Block until the interval elapses or kiosk-idle-reset publishes a new state
+    sel = selectors.DefaultSelector()
+    state_fd = None
+    try:
+        state_fd = watch_file(STATE_FILE)
+        sel.register(state_fd, selectors.EVENT_READ)
+    except Exception as e:
+        print(f"State watch failed, polling instead: {e}")
+
+    idle = is_idle()
+    next_switch = time.monotonic()
+
     while True:
-        if is_idle():
-            with open(LOGFILE, "a") as log:
-                log.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} - Idle detected, switching tab\n")
-            switch_tab()
-        time.sleep(interval)
+        events = sel.select(timeout=max(0, next_switch - time.monotonic()))
+        if events:
+            if file_changed(state_fd, STATE_FILE):
+                idle = is_idle()
+            continue
+
+        if state_fd is None:
+            idle = is_idle()
+        if idle:
+            log.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} - Idle detected, switching tab\n")
+            switch_tab(log)
+        next_switch = time.monotonic() + interval
 
 
 if __name__ == "__main__":
@@ -8,8 +8,8 @@ Web interface to configure the kiosk environment:
 - Restart background services on save
 """
 
-from flask import Flask, request, redirect, render_template_string, url_for, flash, get_flashed_messages
-import json, os, subprocess, traceback
+from flask import Flask, request, redirect, render_template, url_for, flash, get_flashed_messages
+import copy, json, os, subprocess, sys, traceback
 
 # --- Dynamic user detection ---
 USER = os.environ.get("SUDO_USER") or os.environ.get("USER") or "pi"
@@ -187,6 +187,9 @@ window.addEventListener("DOMContentLoaded", () => {
 </html>
 """
 
+# Compile once at import; Flask's environment keeps url_for and autoescaping
+INDEX_TEMPLATE = app.jinja_env.from_string(TEMPLATE)
+
 
 
 # --- Flash helpers ---
@@ -197,26 +200,41 @@ def flash_success(msg):
     flash(msg, "success")
 
 # --- Config handling ---
+# (mtime_ns, parsed config), reused until the file changes; callers get a copy.
+# Kept as one tuple so concurrent requests never pair data with the wrong mtime.
+_cfg_cache = None
+
 def load_config():
     """Load JSON configuration, creating defaults if missing."""
+    global _cfg_cache
     try:
         if not os.path.exists(CONFIG):
             os.makedirs(os.path.dirname(CONFIG), exist_ok=True)
             default_cfg = {"urls": [], "cycle_interval": 60, "idle_timeout": 600}
             save_config(default_cfg)
             return default_cfg
-        with open(CONFIG) as f:
-            return json.load(f)
+        mtime = os.stat(CONFIG).st_mtime_ns
+        cached = _cfg_cache
+        if cached is None or cached[0] != mtime:
+            with open(CONFIG) as f:
+                cached = (mtime, json.load(f))
+            _cfg_cache = cached
+        return copy.deepcopy(cached[1])
     except Exception as e:
         flash_error(f"Error loading config: {e}")
         return {"urls": [], "cycle_interval": 60, "idle_timeout": 600}
 
 def save_config(cfg):
     """Save configuration safely."""
+    global _cfg_cache
+    # Don't trust mtime alone; two saves can land in the same timestamp tick
+    _cfg_cache = None
     try:
         os.makedirs(os.path.dirname(CONFIG), exist_ok=True)
-        with open(CONFIG, "w") as f:
+        tmp = f"{CONFIG}.tmp"
+        with open(tmp, "w") as f:
             json.dump(cfg, f, indent=2)
+        os.replace(tmp, CONFIG)
     except Exception as e:
         flash_error(f"Error saving config: {e}")
         traceback.print_exc()
@@ -234,8 +252,8 @@ def restart_services():
 def index():
     cfg = load_config()
     messages = get_flashed_messages(with_categories=True)
-    return render_template_string(
-        TEMPLATE,
+    return render_template(
+        INDEX_TEMPLATE,
         urls=cfg.get("urls", []),
         cycle_interval=cfg.get("cycle_interval", 60),
         idle_timeout=cfg.get("idle_timeout", 600),
@@ -300,4 +318,11 @@ def save():
 
 # --- Entry point ---
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8080)
+    try:
+        from waitress import serve
+    except ImportError:
+        # Older installs may not have waitress yet; keep the dev server working
+        print("Warning: waitress not installed, falling back to Flask dev server", file=sys.stderr)
+        app.run(host="0.0.0.0", port=8080)
+    else:
+        serve(app, host="0.0.0.0", port=8080, threads=4)
@@ -30,7 +30,7 @@ echo "Installing kiosk environment for user '$USER_NAME'..." | tee "$LOGFILE"
 echo "Installing dependencies..." | tee -a "$LOGFILE"
 apt update -y >>"$LOGFILE" 2>&1
 apt install -y \
-  chromium python3 python3-pip python3-evdev python3-venv python3-flask git jq \
+  chromium python3 python3-pip python3-evdev python3-venv python3-flask python3-waitress git jq \
   xdotool unclutter x11-xserver-utils \
   xserver-xorg labwc xdg-utils >>"$LOGFILE" 2>&1
 